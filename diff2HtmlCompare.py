@@ -20,11 +20,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import io
 import os
 import sys
-import json
+import string
 import difflib
+import functools
+from array import array
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import pygments
 import pdfkit
@@ -33,9 +36,39 @@ import diff_match_patch as dmp_module
 from pygments.formatters import HtmlFormatter
 from pygments.token import *
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    import json
+    _loads = json.loads
+
+try:
+    from fast_diff_match_patch import diff as _cdiff
+except ImportError:
+    _cdiff = None
+
 # Monokai is not quite right yet
 PYGMENTS_STYLES = ["vs", "xcode"] 
 
+# fast_diff_match_patch reports operations as symbols, diff_match_patch as ints
+CDIFF_OPS = {"=": 0, "-": -1, "+": 1}
+
+# numba diff kernels cost a compile (or a cache load) when imported, which only pays
+# off on long transcripts; shorter ones are diffed with difflib
+DIFF_CORE_MIN_LINES = 50000
+
+# escapes transcript text for html and turns newlines into line breaks in one pass
+HTML_TABLE = str.maketrans({'<': '&lt;', '>': '&gt;', '&': '&amp;', '"': '&quot;', '\n': '<br>'})
+
+# resolved once at import, the page links to the deps folder of the working directory
+_CWD = os.getcwd()
+_RESET_CSS = os.path.join(_CWD, "deps", "reset.css")
+_DIFF_CSS = os.path.join(_CWD, "deps", "diff.css")
+_PYGMENTS_CSS_VS = os.path.join(_CWD, "deps", "codeformats", "vs.css")
+_JQUERY_JS = os.path.join(_CWD, "deps", "jquery.min.js")
+_DIFF_JS = os.path.join(_CWD, "deps", "diff.js")
+
 HTML_TEMPLATE = """
 <!DOCTYPE html>
 <html class="no-js">
@@ -53,19 +86,24 @@ HTML_TEMPLATE = """
         -->
         <meta charset="utf-8">
         <title>
-            %(html_title)s
+            {html_title}
         </title>
         <meta name="description" content="">
         <meta name="viewport" content="width=device-width, initial-scale=1">
         <meta name="mobile-web-app-capable" content="yes">
-        <link rel="stylesheet" href="%(reset_css)s" type="text/css">
-        <link rel="stylesheet" href="%(diff_css)s" type="text/css">
-        <link class="syntaxdef" rel="stylesheet" href="%(pygments_css)s" type="text/css">
+        <link rel="stylesheet" href="{reset_css}" type="text/css">
+        <link rel="stylesheet" href="{diff_css}" type="text/css">
+        <link class="syntaxdef" rel="stylesheet" href="{pygments_css}" type="text/css">
+        <style type="text/css">
+            p.text {{color:black;font-weight:bold;font-family:Calibri;font-size:20}}
+            span.add {{color:green;font-weight:bold;font-family:Calibri;font-size:20}}
+            span.remove {{color:red;font-weight:bold;font-family:Calibri;font-size:20}}
+        </style>
     </head>
     <body>
         <div class="" id="topbar">
           <div id="filetitle"> 
-            %(page_title)s
+            {page_title}
           </div>
           <div class="switches">
             <div class="switch">
@@ -90,7 +128,7 @@ HTML_TEMPLATE = """
             </div>
           </div>
         </div>
-        <div id="maincontainer" class="%(page_width)s">
+        <div id="maincontainer" class="{page_width}">
             <div id="leftcode" class="left-inner-shadow codebox divider-outside-bottom">
                 <div class="codefiletab">
                     &#10092; Original
@@ -98,7 +136,7 @@ HTML_TEMPLATE = """
                 <div class="printmargin">
                     01234567890123456789012345678901234567890123456789012345678901234567890123456789
                 </div>
-                %(original_code)s
+                {original_code}
             </div>
             <div id="rightcode" class="left-inner-shadow codebox divider-outside-bottom">
                 <div class="codefiletab">
@@ -107,125 +145,239 @@ HTML_TEMPLATE = """
                 <div class="printmargin">
                     01234567890123456789012345678901234567890123456789012345678901234567890123456789
                 </div>
-                %(modified_code)s
+                {modified_code}
             </div>
         </div>
-<script src="%(jquery_js)s" type="text/javascript"></script>
-<script src="%(diff_js)s" type="text/javascript"></script>
+<script src="{jquery_js}" type="text/javascript"></script>
+<script src="{diff_js}" type="text/javascript"></script>
     </body>
 </html>
 """
 
+# split the template into (literal, field) pairs once instead of re-parsing it per call
+_TEMPLATE_PARTS = [(literal, field) for literal, field, _, _ in string.Formatter().parse(HTML_TEMPLATE)]
 
-def convert_html_to_pdf(html_content, pdf_path):
 
-    pdfkit.from_string(html_content, pdf_path, options={"enable-local-file-access": True})
+def render_template(answers):
 
+    parts = []
 
-def read_json_files(file_path):
+    for literal, field in _TEMPLATE_PARTS:
+
+        parts.append(literal)
+
+        if field is not None:
+
+            parts.append(answers[field])
 
-    with open(file_path, 'r') as f:
+    return "".join(parts)
 
-        json_file = json.load(f)
 
-    return json_file
+def convert_html_to_pdf(html_path, pdf_path):
+
+    # wkhtmltopdf reads the page straight from disk, no in-memory copy or temp file
+    pdfkit.from_file(html_path, pdf_path, options={"enable-local-file-access": True})
+
+
+def read_json_files(file_path):
+
+    with open(file_path, 'rb') as f:
+
+        return _loads(f.read())
 
 
 def extract_data_from_json(json_obj, field):
 
-    field_extraction = []
+    # transcription, one newline-terminated line per speaker turn
+    return "".join(f"{line['speaker']}: {line[field]}\n" for line in json_obj)
 
-    for line in json_obj:
 
-        # transcription
-        field_extraction.append(line['speaker'] + ": " + line[field] + "\n")
+def read_transcript(file_path):
 
-    return '\n'.join(field_extraction)
+    return extract_data_from_json(read_json_files(file_path), 'transcription')
 
 
-def paint_text(diff, original=False):
+def _diff_middle(text1, text2):
 
-    if original:
+    if _cdiff is not None:
 
-        html_span = "<span class=\"remove\">"
+        # native Myers + semantic cleanup, same (op, text) shape as diff_match_patch
+        diff = _cdiff(text1, text2, cleanup="Semantic", counts_only=False)
 
-    else:
+        return [(CDIFF_OPS[op], text) for op, text in diff]
+
+    dmp = dmp_module.diff_match_patch()
+
+    diff = dmp.diff_main(text1, text2)
+
+    dmp.diff_cleanupSemantic(diff)
+
+    return diff
+
+
+def _diff(text1, text2):
+
+    dmp = dmp_module.diff_match_patch()
+
+    # transcripts mostly share their head and tail, only diff what is in between
+    prefix = dmp.diff_commonPrefix(text1, text2)
+
+    suffix = dmp.diff_commonSuffix(text1[prefix:], text2[prefix:])
+
+    end1, end2 = len(text1) - suffix, len(text2) - suffix
+
+    diff = []
+
+    if prefix:
+
+        diff.append((0, text1[:prefix]))
+
+    if prefix < end1 or prefix < end2:
+
+        diff.extend(_diff_middle(text1[prefix:end1], text2[prefix:end2]))
+
+    if suffix:
+
+        diff.append((0, text1[end1:]))
+
+    return diff
+
+
+@functools.lru_cache(maxsize=None)
+def _load_diff_core():
 
-        html_span = "<span class=\"add\">"
+    # numba raises RuntimeError when it has nowhere writable to cache the kernels
+    try:
+        import diff_core
+    except (ImportError, RuntimeError):
+        return None
+
+    return diff_core
+
+
+def _diff_lines(from_lines, to_lines):
+
+    # intern every distinct line to an int so the matcher compares ints, not strings
+    ids = {}
+
+    from_ids = array('i', [ids.setdefault(line, len(ids)) for line in from_lines])
+
+    to_ids = array('i', [ids.setdefault(line, len(ids)) for line in to_lines])
+
+    diff = []
+
+    diff_core = None
+
+    if len(from_lines) + len(to_lines) >= DIFF_CORE_MIN_LINES:
+
+        diff_core = _load_diff_core()
+
+    if diff_core is not None:
+
+        for op, i, j, length in diff_core.diff_ids(from_ids, to_ids).tolist():
+
+            lines = to_lines[j:j + length] if op == 1 else from_lines[i:i + length]
+
+            diff.append((op, ''.join(lines)))
+
+        return diff
+
+    matcher = difflib.SequenceMatcher(None, from_ids, to_ids, autojunk=False)
+
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+
+        if tag == 'equal':
+
+            diff.append((0, ''.join(from_lines[i1:i2])))
+
+            continue
+
+        if i1 < i2:
+
+            diff.append((-1, ''.join(from_lines[i1:i2])))
+
+        if j1 < j2:
+
+            diff.append((1, ''.join(to_lines[j1:j2])))
+
+    return diff
+
+
+def paint_both(diff):
+
+    remove_span = "<span class=\"remove\">"
+
+    add_span = "<span class=\"add\">"
 
-    
     close_span = "</span>"
 
-    complete_text = "<body><p class=\"text\">"
+    orig_parts = ["<body><p class=\"text\">"]
+
+    mod_parts = ["<body><p class=\"text\">"]
 
-    for index, (code, text) in enumerate(diff):
+    for code, text in diff:
+
+        text = text.translate(HTML_TABLE)
 
         if code == 0:
 
-            complete_text += text
+            orig_parts.append(text)
+
+            mod_parts.append(text)
 
-        elif code == -1 and original:
+        elif code == -1:
 
-            complete_text += html_span + text + close_span
+            orig_parts.append(remove_span + text + close_span)
 
-        elif code == 1 and not original:
+        elif code == 1:
 
-            complete_text += html_span + text + close_span
+            mod_parts.append(add_span + text + close_span)
 
 
-    return complete_text.replace('\n', '<br>') + "</body></p>"
+    return "".join(orig_parts) + "</body></p>", "".join(mod_parts) + "</body></p>"
 
 
 def format(options, file1, file2):
 
+    # read both transcripts concurrently so the disk reads overlap
+    with ThreadPoolExecutor(max_workers=2) as executor:
 
-    color_format = """
-                      <style type="text/css">
-                          p.text {color:black;font-weight:bold;font-family:Calibri;font-size:20}
-                          span.add {color:green;font-weight:bold;font-family:Calibri;font-size:20}
-                          span.remove {color:red;font-weight:bold;font-family:Calibri;font-size:20}
-                      </style>
-                      </head>
-                    """
+        fromlines, tolines = executor.map(read_transcript, [file1, file2])
 
-    fromlines = read_json_files(file1)
-    fromlines = extract_data_from_json(fromlines, 'transcription')
+    if getattr(options, 'char_diff', False):
 
-    tolines = read_json_files(file2)
-    tolines = extract_data_from_json(tolines, 'transcription')
+        diff = _diff(fromlines, tolines)
 
-    dmp = dmp_module.diff_match_patch()
-
-    diff = dmp.diff_main(''.join(fromlines), ''.join(tolines))
+    else:
 
-    dmp.diff_cleanupSemantic(diff)
+        diff = _diff_lines(fromlines.splitlines(True), tolines.splitlines(True))
 
-    painted_original_code = paint_text(diff, True)
+        # no semantic cleanup or merging needed: line hunks are already coarse, diff_core
+        # run-length encodes its rows and difflib puts an equal between any two edits
 
-    painted_modified_code = paint_text(diff)
+    painted_original_code, painted_modified_code = paint_both(diff)
 
 
     answers = {
         "html_title":     "Transcript Comparision",
-        "reset_css":      os.getcwd() +  "/deps/reset.css",
-        "pygments_css":   os.getcwd() + "/deps/codeformats/%s.css" % 'vs',
-        "diff_css":       os.getcwd() + "/deps/diff.css",
+        "reset_css":      _RESET_CSS,
+        "pygments_css":   _PYGMENTS_CSS_VS,
+        "diff_css":       _DIFF_CSS,
         "page_title":     "Transcript Comparision",
-        "original_code":  color_format + painted_original_code,
-        "modified_code":  color_format + painted_modified_code,
-        "jquery_js":      os.getcwd() +  "/deps/jquery.min.js",
-        "diff_js":        os.getcwd() +  "/deps/diff.js",
+        "original_code":  painted_original_code,
+        "modified_code":  painted_modified_code,
+        "jquery_js":      _JQUERY_JS,
+        "diff_js":        _DIFF_JS,
         "page_width":     "page-80-width" if False else "page-full-width"
     }
 
-    htmlContents = HTML_TEMPLATE % answers
+    htmlContents = render_template(answers)
 
     return htmlContents
 
 def write(path, htmlContents):
-    fh = io.open(path, 'w')
-    fh.write(htmlContents)
-    fh.close()
+    # explicit utf-8, the locale default (e.g. cp1252) can't encode every transcript
+    Path(path).write_text(htmlContents, encoding='utf-8', newline='\n')
 
 
 def main(file1, file2, outputpath, options):
@@ -240,6 +392,8 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('file1', help='source file to compare ("before" file).')
     parser.add_argument('file2', help='source file to compare ("after" file).')
+    parser.add_argument('--char-diff', action='store_true',
+                        help='diff character by character instead of line by line.')
 
     args = parser.parse_args()
 
@@ -249,13 +403,7 @@ if __name__ == "__main__":
     main(args.file1, args.file2, outputpath, args)
 
 
-    with open(outputpath, "r") as file:
-
-        html_source = file.read()
-
-
-
-    convert_html_to_pdf(html_source, "output.pdf")
+    convert_html_to_pdf(outputpath, "output.pdf")
 
     #makepdf(html_source, 'from_html.pdf')
 
@@ -0,0 +1,262 @@
+# Myers (1986) diff over sequences of interned line ids, compiled with numba.
+# diff2HtmlCompare imports it only for long transcripts and uses difflib otherwise,
+# or when numba is not installed.
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def _encode(steps, count):
+
+    # run-length encode forward ordered 0/-1/1 steps into (op, a_idx, b_idx, len) rows
+    rows = np.empty((count, 4), np.int32)
+    nrows = 0
+    ai = 0
+    bi = 0
+
+    for s in range(count):
+
+        op = steps[s]
+
+        if nrows > 0 and rows[nrows - 1, 0] == op:
+
+            rows[nrows - 1, 3] += 1
+
+        else:
+
+            rows[nrows, 0] = op
+            rows[nrows, 1] = ai
+            rows[nrows, 2] = bi
+            rows[nrows, 3] = 1
+            nrows += 1
+
+        if op != 1:
+
+            ai += 1
+
+        if op != -1:
+
+            bi += 1
+
+    return rows[:nrows].copy()
+
+
+@njit(cache=True)
+def _middle_snake(a, alo, ahi, b, blo, bhi, v1, v2):
+
+    # Myers' middle snake: run forward and reverse searches until their paths
+    # overlap, returning the point where they meet, or (-1, -1) when a[alo:ahi]
+    # and b[blo:bhi] have nothing in common
+    n = ahi - alo
+    m = bhi - blo
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+
+    v1[:v_length] = -1
+    v2[:v_length] = -1
+    v1[v_offset + 1] = 0
+    v2[v_offset + 1] = 0
+
+    delta = n - m
+
+    # with an odd delta the paths can only overlap during the forward pass
+    front = (delta & 1) == 1
+
+    k1start = 0
+    k1end = 0
+    k2start = 0
+    k2end = 0
+
+    for d in range(max_d):
+
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+
+            k1_offset = v_offset + k1
+
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+
+                x1 = v1[k1_offset + 1]
+
+            else:
+
+                x1 = v1[k1_offset - 1] + 1
+
+            y1 = x1 - k1
+
+            while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+
+                x1 += 1
+                y1 += 1
+
+            v1[k1_offset] = x1
+
+            if x1 > n:
+
+                k1end += 2
+
+            elif y1 > m:
+
+                k1start += 2
+
+            elif front:
+
+                k2_offset = v_offset + delta - k1
+
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+
+                    if x1 >= n - v2[k2_offset]:
+
+                        return alo + x1, blo + y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+
+            k2_offset = v_offset + k2
+
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+
+                x2 = v2[k2_offset + 1]
+
+            else:
+
+                x2 = v2[k2_offset - 1] + 1
+
+            y2 = x2 - k2
+
+            while x2 < n and y2 < m and a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+
+                x2 += 1
+                y2 += 1
+
+            v2[k2_offset] = x2
+
+            if x2 > n:
+
+                k2end += 2
+
+            elif y2 > m:
+
+                k2start += 2
+
+            elif not front:
+
+                k1_offset = v_offset + delta - k2
+
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+
+                    x1 = v1[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+
+                    if x1 >= n - x2:
+
+                        return alo + x1, blo + y1
+
+    return -1, -1
+
+
+@njit(cache=True)
+def linear_myers(a, b):
+
+    n = a.shape[0]
+    m = b.shape[0]
+
+    # O(N + M) memory: the V arrays are shared by every subproblem
+    v_size = 2 * ((n + m + 1) // 2) + 2
+    v1 = np.empty(v_size, np.int64)
+    v2 = np.empty(v_size, np.int64)
+
+    steps = np.empty(n + m, np.int8)
+    count = 0
+
+    # pending (kind, alo, ahi, blo, bhi), left side popped first; kind 1 is a
+    # run of alo equal steps left over from stripping a common suffix
+    stack = np.empty((64, 5), np.int64)
+    stack[0, 0] = 0
+    stack[0, 1] = 0
+    stack[0, 2] = n
+    stack[0, 3] = 0
+    stack[0, 4] = m
+    top = 1
+
+    while top > 0:
+
+        top -= 1
+        kind = stack[top, 0]
+        alo = stack[top, 1]
+        ahi = stack[top, 2]
+        blo = stack[top, 3]
+        bhi = stack[top, 4]
+
+        if kind == 1:
+
+            steps[count:count + alo] = 0
+            count += alo
+            continue
+
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+
+            steps[count] = 0
+            count += 1
+            alo += 1
+            blo += 1
+
+        suffix = 0
+
+        while alo < ahi - suffix and blo < bhi - suffix and a[ahi - suffix - 1] == b[bhi - suffix - 1]:
+
+            suffix += 1
+
+        ahi -= suffix
+        bhi -= suffix
+
+        if top + 3 > stack.shape[0]:
+
+            grown = np.empty((2 * stack.shape[0], 5), np.int64)
+            grown[:top] = stack[:top]
+            stack = grown
+
+        if suffix > 0:
+
+            stack[top, 0] = 1
+            stack[top, 1] = suffix
+            top += 1
+
+        x = -1
+        y = -1
+
+        if alo < ahi and blo < bhi:
+
+            x, y = _middle_snake(a, alo, ahi, b, blo, bhi, v1, v2)
+
+        if x < 0 or (x == alo and y == blo) or (x == ahi and y == bhi):
+
+            steps[count:count + ahi - alo] = -1
+            count += ahi - alo
+            steps[count:count + bhi - blo] = 1
+            count += bhi - blo
+            continue
+
+        stack[top, 0] = 0
+        stack[top, 1] = x
+        stack[top, 2] = ahi
+        stack[top, 3] = y
+        stack[top, 4] = bhi
+        stack[top + 1, 0] = 0
+        stack[top + 1, 1] = alo
+        stack[top + 1, 2] = x
+        stack[top + 1, 3] = blo
+        stack[top + 1, 4] = y
+        top += 2
+
+    return _encode(steps, count)
+
+
+def diff_ids(a, b):
+
+    # a single int32 specialization keeps the numba compile to one kernel set
+    a = np.asarray(a, dtype=np.int32)
+    b = np.asarray(b, dtype=np.int32)
+
+    return linear_myers(a, b)
+
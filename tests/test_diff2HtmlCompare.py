@@ -0,0 +1,80 @@
+import pytest
+
+import diff2HtmlCompare
+
+
+def rebuild(diff):
+
+    original = "".join(text for code, text in diff if code != 1)
+    modified = "".join(text for code, text in diff if code != -1)
+
+    return original, modified
+
+
+@pytest.mark.parametrize("text1, text2", [
+    ("", ""),
+    ("same text\n", "same text\n"),
+    ("", "only in the new one\n"),
+    ("only in the old one\n", ""),
+    ("A: hello\nB: world\n", "A: hello\nB: there world\n"),
+    ("A: hello\nB: world\n", "A: hello\n"),
+    ("B: world\n", "A: hello\nB: world\n"),
+    ("aaa", "aaaa"),
+    ("abXcd", "abYcd"),
+])
+def test_diff_trims_prefix_and_suffix(text1, text2):
+
+    diff = diff2HtmlCompare._diff(text1, text2)
+
+    assert rebuild(diff) == (text1, text2)
+    assert all(text for _, text in diff)
+
+
+def test_diff_keeps_shared_head_and_tail_whole():
+
+    diff = diff2HtmlCompare._diff("head X tail", "head Y tail")
+
+    assert diff[0] == (0, "head ")
+    assert diff[-1] == (0, " tail")
+
+
+def test_diff_of_identical_texts_is_one_equality():
+
+    assert diff2HtmlCompare._diff("A: same\n", "A: same\n") == [(0, "A: same\n")]
+
+
+def test_format_accepts_options_without_char_diff(tmp_path):
+
+    old = tmp_path / "old.json"
+    new = tmp_path / "new.json"
+    old.write_text('[{"speaker": "A", "transcription": "hello"}]')
+    new.write_text('[{"speaker": "A", "transcription": "hello there"}]')
+
+    html = diff2HtmlCompare.format(None, str(old), str(new))
+
+    assert '<span class="remove">A: hello<br></span>' in html
+    assert '<span class="add">A: hello there<br></span>' in html
+
+
+def test_paint_both_escapes_html_on_every_op():
+
+    diff = [
+        (0, 'A: <b>"kept"</b> & more\n'),
+        (-1, 'B: <script>alert("x")</script>\n'),
+        (1, 'C: 1 < 2 & "3" > 0\n'),
+    ]
+
+    original, modified = diff2HtmlCompare.paint_both(diff)
+
+    kept = 'A: &lt;b&gt;&quot;kept&quot;&lt;/b&gt; &amp; more<br>'
+
+    assert original == (
+        '<body><p class="text">' + kept
+        + '<span class="remove">B: &lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt;<br></span>'
+        + '</body></p>'
+    )
+    assert modified == (
+        '<body><p class="text">' + kept
+        + '<span class="add">C: 1 &lt; 2 &amp; &quot;3&quot; &gt; 0<br></span>'
+        + '</body></p>'
+    )
@@ -0,0 +1,150 @@
+import random
+from array import array
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("numba")
+
+import diff_core
+import diff2HtmlCompare
+
+
+def lcs_length(a, b):
+
+    row = [0] * (len(b) + 1)
+
+    for x in a:
+
+        diag = 0
+
+        for j, y in enumerate(b, 1):
+
+            diag, row[j] = row[j], diag + 1 if x == y else max(row[j], row[j - 1])
+
+    return row[-1]
+
+
+def check_rows(a, b, rows):
+
+    rebuilt_a, rebuilt_b, equal = [], [], 0
+
+    for op, i, j, length in rows.tolist():
+
+        assert length > 0
+
+        if op == 0:
+
+            assert a[i:i + length] == b[j:j + length]
+            rebuilt_a += a[i:i + length]
+            rebuilt_b += b[j:j + length]
+            equal += length
+
+        elif op == -1:
+
+            assert i == len(rebuilt_a)
+            rebuilt_a += a[i:i + length]
+
+        else:
+
+            assert j == len(rebuilt_b)
+            rebuilt_b += b[j:j + length]
+
+    assert rebuilt_a == a
+    assert rebuilt_b == b
+    assert equal == lcs_length(a, b)
+
+
+def random_pair(rng):
+
+    a = [rng.randint(0, 5) for _ in range(rng.randint(0, 40))]
+    b = [rng.randint(0, 5) for _ in range(rng.randint(0, 40))]
+
+    return a, b
+
+
+def test_diff_ids_is_minimal():
+
+    rng = random.Random(0)
+
+    for _ in range(300):
+
+        a, b = random_pair(rng)
+        check_rows(a, b, diff_core.diff_ids(array('i', a), array('i', b)))
+
+
+def check_line_diff(from_lines, to_lines, diff, minimal=True):
+
+    original = "".join(text for code, text in diff if code != 1)
+    modified = "".join(text for code, text in diff if code != -1)
+    equal = sum(text.count("\n") for code, text in diff if code == 0)
+
+    assert original == "".join(from_lines)
+    assert modified == "".join(to_lines)
+
+    if minimal:
+
+        assert equal == lcs_length(from_lines, to_lines)
+
+
+def edited_transcript(rng, vocabulary):
+
+    from_lines = ["%s: line %d\n" % ("AB"[i % 2], rng.randrange(vocabulary)) for i in range(120)]
+    to_lines = list(from_lines)
+
+    for _ in range(15):
+
+        position = rng.randrange(len(to_lines))
+
+        if rng.random() < 0.5:
+
+            del to_lines[position]
+
+        else:
+
+            to_lines.insert(position, "C: line %d\n" % rng.randrange(vocabulary))
+
+    return from_lines, to_lines
+
+
+@pytest.mark.parametrize("vocabulary", [5, 40, 10 ** 6])
+def test_diff_lines_with_and_without_diff_core(monkeypatch, vocabulary):
+
+    rng = random.Random(vocabulary)
+
+    for _ in range(20):
+
+        from_lines, to_lines = edited_transcript(rng, vocabulary)
+
+        monkeypatch.setattr(diff2HtmlCompare, "DIFF_CORE_MIN_LINES", 0)
+        check_line_diff(from_lines, to_lines, diff2HtmlCompare._diff_lines(from_lines, to_lines))
+
+        # difflib is not an LCS algorithm, only its reconstruction is exact
+        monkeypatch.setattr(diff2HtmlCompare, "DIFF_CORE_MIN_LINES", float("inf"))
+        check_line_diff(from_lines, to_lines, diff2HtmlCompare._diff_lines(from_lines, to_lines), minimal=False)
+
+
+def test_large_diff_is_exact():
+
+    # 60k distinct lines with 3000 replaced by new ones, too long for the LCS table
+    rng = np.random.default_rng(0)
+    a = np.arange(60000, dtype=np.int32)
+    b = a.copy()
+    replaced = np.sort(rng.choice(a.shape[0], 3000, replace=False))
+    b[replaced] = a.shape[0] + np.arange(3000)
+
+    rows = diff_core.diff_ids(a, b)
+
+    rebuilt_a = np.concatenate([a[i:i + length] for op, i, _, length in rows.tolist() if op != 1])
+    rebuilt_b = np.concatenate([b[j:j + length] for op, _, j, length in rows.tolist() if op != -1])
+
+    assert np.array_equal(rebuilt_a, a)
+    assert np.array_equal(rebuilt_b, b)
+    assert sum(length for op, _, _, length in rows.tolist() if op == 0) == 57000
+
+    # each stretch of untouched lines between runs of replaced ones is exactly one
+    # equal row; deletes and inserts may interleave inside a run
+    runs = 1 + int(np.count_nonzero(np.diff(replaced) > 1))
+    equal_rows = runs + 1 - int(replaced[0] == 0) - int(replaced[-1] == a.shape[0] - 1)
+
+    assert sum(1 for op, _, _, _ in rows.tolist() if op == 0) == equal_rows